@@ -139,7 +139,7 @@ class BayesOptServer(object):
 
         # Obtain the new parameter values.
         # (ROS messages can only deal with lists, not np.ndarrays)
-        x_new = list(self.bo.next(goal.y_new))
+        x_new = self.bo.next(goal.y_new).tolist()
 
         # Pretty-log the response to std out
         if not self.silent:
@@ -5,23 +5,56 @@ import time
 import torch
 import yaml
 
+from functools import wraps
 from torch import Tensor
+from typing import Callable, TYPE_CHECKING
 
-from bayesopt4ros.util import DataHandler
+from bayesopt4ros.util import DataHandler, _lazy_botorch
 
-from botorch.acquisition import (
-    UpperConfidenceBound,
-    ExpectedImprovement,
-    NoisyExpectedImprovement,
-)
-from botorch.fit import fit_gpytorch_scipy
-from botorch.models import SingleTaskGP
-from botorch.models.gpytorch import GPyTorchModel
-from botorch.optim import optimize_acqf
-from botorch.models.transforms.input import Normalize
-from botorch.models.transforms.outcome import Standardize
+if TYPE_CHECKING:
+    from botorch.models.gpytorch import GPyTorchModel
 
-from gpytorch.mlls import ExactMarginalLogLikelihood
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+def _cholesky_jitter():
+    """Returns the context manager for the jitter used in Cholesky decompositions.
+
+    Single precision (i.e. on the GPU) requires more jitter than double precision.
+    """
+    return _lazy_botorch().cholesky_jitter(float=1e-4, double=1e-6)
+
+
+def cpu_fallback_on_oom(func: Callable) -> Callable:
+    """Decorator that repeats a computation on the CPU if the GPU runs out of memory.
+
+    Parameters
+    ----------
+    func : Callable
+        The method of :class:`BayesianOptimization` to be decorated.
+
+    Returns
+    -------
+    Callable
+        The decorated method.
+    """
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        except RuntimeError as e:
+            if self.device.type != "cuda" or "out of memory" not in str(e):
+                raise
+            rospy.logwarn("[BayesOpt] GPU ran out of memory. Falling back to CPU.")
+            torch.cuda.empty_cache()
+            self._move_to_device(torch.device("cpu"))
+            return func(self, *args, **kwargs)
+
+    return wrapper
 
 
 class BayesianOptimization(object):
@@ -44,6 +77,8 @@ class BayesianOptimization(object):
         n_init: int = 5,
         log_dir: str = None,
         config: dict = None,
+        device: torch.device = None,
+        dtype: torch.dtype = None,
     ) -> None:
         """The BayesianOptimization class initializer.
 
@@ -68,12 +103,26 @@ class BayesianOptimization(object):
             Directory to which the log files are stored.
         config : dict
             The configuration dictionary for the experiment.
+        device : torch.device
+            Device on which the GP model lives. Defaults to the GPU if available.
+        dtype : torch.dtype
+            Data type of all tensors used for the GP model. Defaults to double
+            precision on the CPU and single precision on the GPU.
         """
+        if device is None:
+            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        if dtype is None:
+            # The Cholesky decomposition is more robust in double precision but
+            # GPUs have a much higher throughput in single precision.
+            dtype = torch.float64 if device.type == "cpu" else torch.float32
+        self.device = device
+        self.dtype = dtype
         self.input_dim = input_dim
         self.max_iter = max_iter
-        self.bounds = bounds
-        self.acq_func = acq_func
+        self.bounds = bounds.to(device=device, dtype=dtype).contiguous()
+        self.acq_func = acq_func.upper()
         self.gp = None  # GP is initialized when first data arrives
+        self._rebuild_on_update = False  # otherwise only the GP's data is replaced
         self.n_init = n_init
         self.x_init = self._initial_design(n_init)
         self.x_new = None
@@ -114,7 +163,7 @@ class BayesianOptimization(object):
         # Read config from file
         try:
             with open(config_file, "r") as f:
-                config = yaml.load(f, Loader=yaml.FullLoader)
+                config = yaml.load(f, Loader=SafeLoader)
 
         except FileNotFoundError:
             rospy.logerr(
@@ -123,9 +172,14 @@ class BayesianOptimization(object):
             exit(1)
 
         # Bring bounds in correct format
-        lb = torch.tensor(config["lower_bound"])
-        ub = torch.tensor(config["upper_bound"])
-        bounds = torch.stack((lb, ub))
+        # Note: the bounds are cast to the model's dtype in the initializer
+        lb = torch.tensor(config["lower_bound"], dtype=torch.float64)
+        ub = torch.tensor(config["upper_bound"], dtype=torch.float64)
+        bounds = torch.stack((lb, ub)).contiguous()
+
+        # Optional device/dtype, e.g. `device: "cpu"` and `dtype: "float64"`
+        device = torch.device(config["device"]) if "device" in config else None
+        dtype = getattr(torch, config["dtype"]) if "dtype" in config else None
 
         # Construct class instance based on the config
         return cls(
@@ -136,6 +190,8 @@ class BayesianOptimization(object):
             n_init=config["n_init"],
             log_dir=config["log_dir"],
             config=config,
+            device=device,
+            dtype=dtype,
         )
 
     def next(self, y_new: float) -> Tensor:
@@ -166,7 +222,7 @@ class BayesianOptimization(object):
         # 3) Save current state to file
         self._log_results()
 
-        return self.x_new.squeeze(0)
+        return self.x_new.squeeze(0).cpu()
 
     def update_last_y(self, y_last: float) -> None:
         """Updates the GP model with the last function value obtained.
@@ -223,34 +279,83 @@ class BayesianOptimization(object):
             # trigger the server. At that point, there is no new input point,
             # hence, no need to need to update the model.
             return
-        self.data_handler.add_xy(x=self.x_new, y=torch.tensor([[y_new]]))
+        y_new = torch.tensor([[y_new]], device=self.device, dtype=self.dtype)
+        self.data_handler.add_xy(x=self.x_new.detach(), y=y_new)
 
         if self.n_data >= self.n_init:
             # Only create model once we are done with the initial design phase
-            if self.gp:
-                x, y = self.data_handler.get_xy()
-                self.gp.set_train_data(x, y.squeeze(-1), strict=False)
+            x, y = self.data_handler.get_xy()
+            if self.gp is not None and not self._rebuild_on_update:
+                self._set_train_data(x, y)
             else:
-                self.gp = self._initialize_model(*self.data_handler.get_xy())
+                self.gp = self._initialize_model(x, y)
             self._optimize_model()
+            self._prefetch_posterior()
+
+    def _set_train_data(self, x: Tensor, y: Tensor) -> None:
+        """Replaces the training data of the existing GP without rebuilding it.
+
+        .. note:: ``set_train_data`` bypasses the outcome transform, hence we need
+            to standardize the targets ourselves. Doing so in training mode also
+            updates the transform's statistics used for the posterior.
+
+        Parameters
+        ----------
+        x : torch.Tensor
+            All training inputs.
+        y : torch.Tensor
+            All (untransformed) training targets.
+        """
+        # Switching to training mode first reverts the inputs to their original
+        # (untransformed) values in BoTorch versions that transform them in eval()
+        self.gp.train()
+        with torch.no_grad():
+            y, _ = self.gp.outcome_transform(y)
+        self.gp.set_train_data(x, y.squeeze(-1), strict=False)
+        if hasattr(self.gp, "_original_train_inputs"):
+            # Otherwise, the next call to train() would restore the previous inputs
+            self.gp._original_train_inputs = x
 
     @staticmethod
-    def _initialize_model(x, y) -> GPyTorchModel:
+    def _initialize_model(x, y) -> "GPyTorchModel":
+        bt = _lazy_botorch()
         # Note: the default values from BoTorch are quite good
-        gp = SingleTaskGP(
+        gp = bt.SingleTaskGP(
             train_X=x,
             train_Y=y,
-            outcome_transform=Standardize(m=1),  # zero mean, unit variance
-            input_transform=Normalize(d=x.shape[1]),  # unit cube
+            outcome_transform=bt.Standardize(m=1),  # zero mean, unit variance
+            input_transform=bt.Normalize(d=x.shape[1]),  # unit cube
         )
         return gp
 
+    @cpu_fallback_on_oom
     def _optimize_model(self) -> None:
-        mll = ExactMarginalLogLikelihood(self.gp.likelihood, self.gp)
+        bt = _lazy_botorch()
+        mll = bt.ExactMarginalLogLikelihood(self.gp.likelihood, self.gp)
         mll.train()
-        fit_gpytorch_scipy(mll)
+        # Dense Cholesky for the typically small data sets in BO; only above
+        # max_cholesky_size, GPyTorch switches to (preconditioned) CG.
+        with bt.max_cholesky_size(800), bt.cg_tolerance(1e-2), bt.fast_computations(
+            covar_root_decomposition=True, log_prob=True, solves=True
+        ), _cholesky_jitter():
+            bt.fit_gpytorch_scipy(mll)
         mll.eval()
 
+    @cpu_fallback_on_oom
+    def _prefetch_posterior(self) -> None:
+        """Populates the GP's prediction caches right after fitting the model.
+
+        The caches (e.g. K^{-1}y) only depend on the training data, such that all
+        acquisition function evaluations in :meth:`_optimize_acq` can reuse them.
+        """
+        bt = _lazy_botorch()
+        # The caches do not depend on the test inputs, hence, a single point suffices
+        x = self.bounds[:1]
+        with torch.no_grad():
+            with bt.fast_pred_var(), _cholesky_jitter():
+                self.gp.posterior(x)
+
+    @cpu_fallback_on_oom
     def _optimize_acq(self) -> Tensor:
         """Optimizes the acquisition function.
 
@@ -259,21 +364,31 @@ class BayesianOptimization(object):
         torch.Tensor
             Location of the acquisition function's optimum.
         """
-        if self.acq_func.upper() == "UCB":
-            acq_func = UpperConfidenceBound(model=self.gp, beta=4.0)
-        elif self.acq_func.upper() == "EI":
+        bt = _lazy_botorch()
+        if self.acq_func == "UCB":
+            acq_func = bt.UpperConfidenceBound(model=self.gp, beta=4.0)
+        elif self.acq_func == "EI":
             best_f = self.data_handler.y_best  # note that EI assumes noiseless
-            acq_func = ExpectedImprovement(model=self.gp, best_f=best_f)
-        elif self.acq_func.upper() == "NEI":
+            acq_func = bt.ExpectedImprovement(model=self.gp, best_f=best_f)
+        elif self.acq_func == "NEI":
             raise NotImplementedError("Coming soon...")
         else:
             raise NotImplementedError(
                 f"{self.acq_func} is not a valid acquisition function"
             )
 
-        x_opt, _ = optimize_acqf(
-            acq_func, self.bounds, q=1, num_restarts=10, raw_samples=2000, sequential=True
-        )
+        # All restarts are optimized jointly as a single batch, i.e., each L-BFGS
+        # iteration evaluates the acquisition function only once for all of them.
+        num_restarts = 10
+        with bt.fast_pred_var(), _cholesky_jitter():
+            x_opt, _ = bt.optimize_acqf(
+                acq_func,
+                self.bounds,
+                q=1,
+                num_restarts=num_restarts,
+                raw_samples=2000,
+                options={"batch_limit": num_restarts},
+            )
         return x_opt
 
     def _initial_design(self, n_init: int) -> Tensor:
@@ -291,9 +406,33 @@ class BayesianOptimization(object):
         """
         sobol_eng = torch.quasirandom.SobolEngine(dimension=self.input_dim)
         sobol_eng.fast_forward(n=1)  # first point is origin, boring...
-        x0_init = sobol_eng.draw(n_init)  # points are in [0, 1]^d
+        x0_init = sobol_eng.draw(n_init).to(self.bounds)  # points are in [0, 1]^d
         return self.bounds[0] + (self.bounds[1] - self.bounds[0]) * x0_init
 
+    def _move_to_device(self, device: torch.device) -> None:
+        """Moves the domain, the data and the GP model to another device.
+
+        Parameters
+        ----------
+        device : torch.device
+            The target device.
+        """
+        self.device = device
+        self.bounds = self.bounds.to(device)
+        self.x_init = self.x_init.to(device)
+        if self.x_new is not None:
+            self.x_new = self.x_new.to(device)
+        if self.n_data:
+            x, y = self.data_handler.get_xy()
+            self.data_handler.set_xy(x=x.to(device), y=y.to(device))
+        if self.gp is not None:
+            self.gp = self.gp.to(device)
+            self.gp.prediction_strategy = None  # cached on the old device
+            if hasattr(self.gp, "_original_train_inputs"):
+                # Plain attribute, hence, not moved by `to()`
+                self.gp._original_train_inputs = self.gp._original_train_inputs.to(device)
+
+    @torch.no_grad()
     def _log_results(self) -> None:
         """Log evaluations and GP model to file.
 
@@ -314,7 +453,7 @@ class BayesianOptimization(object):
             # Compute rolling best input/ouput pair
             x, y = self.data_handler.get_xy()
 
-            idx_best = torch.tensor([torch.argmax(y[: i + 1]) for i in range(y.shape[0])])
+            idx_best = self.data_handler.idx_best_rolling
             x_best = x[idx_best]
             y_best = y[idx_best]
 
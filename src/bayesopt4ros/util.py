@@ -2,12 +2,61 @@ import argparse
 import rospy
 import torch
 
-from botorch.exceptions.errors import BotorchTensorDimensionError
-from botorch.utils.containers import TrainingData
+from functools import lru_cache
 from torch import Tensor
+from types import SimpleNamespace
 from typing import Union
 
 
+@lru_cache(maxsize=None)
+def _lazy_botorch() -> SimpleNamespace:
+    """Imports BoTorch and GPyTorch upon first use.
+
+    Importing both libraries takes a considerable amount of time, which should not
+    be paid when only importing this package, e.g., for reading a config file.
+
+    Returns
+    -------
+    SimpleNamespace
+        Namespace containing all BoTorch/GPyTorch objects used in this package.
+    """
+    from botorch.acquisition import UpperConfidenceBound, ExpectedImprovement
+    from botorch.exceptions.errors import BotorchTensorDimensionError
+    from botorch.fit import fit_gpytorch_scipy
+    from botorch.models import SingleTaskGP
+    from botorch.optim import optimize_acqf
+    from botorch.models.transforms.input import Normalize
+    from botorch.models.transforms.outcome import Standardize
+    from botorch.utils.containers import TrainingData
+
+    from gpytorch.mlls import ExactMarginalLogLikelihood
+    from gpytorch.settings import (
+        cg_tolerance,
+        cholesky_jitter,
+        fast_computations,
+        fast_pred_var,
+        max_cholesky_size,
+    )
+
+    return SimpleNamespace(
+        BotorchTensorDimensionError=BotorchTensorDimensionError,
+        UpperConfidenceBound=UpperConfidenceBound,
+        ExpectedImprovement=ExpectedImprovement,
+        fit_gpytorch_scipy=fit_gpytorch_scipy,
+        SingleTaskGP=SingleTaskGP,
+        optimize_acqf=optimize_acqf,
+        Normalize=Normalize,
+        Standardize=Standardize,
+        TrainingData=TrainingData,
+        ExactMarginalLogLikelihood=ExactMarginalLogLikelihood,
+        cg_tolerance=cg_tolerance,
+        cholesky_jitter=cholesky_jitter,
+        fast_computations=fast_computations,
+        fast_pred_var=fast_pred_var,
+        max_cholesky_size=max_cholesky_size,
+    )
+
+
 class DataHandler(object):
     """Helper class that handles all data for BayesOpt."""
 
@@ -16,7 +65,9 @@ class DataHandler(object):
         if x is not None and y is not None:
             self.set_xy(x=x, y=y)
         else:
-            self.data = TrainingData(X=torch.tensor([]), Y=torch.tensor([]))
+            self.data = _lazy_botorch().TrainingData(
+                X=torch.tensor([]), Y=torch.tensor([])
+            )
 
     def get_xy(self, as_dict: dict = False):
         if as_dict:
@@ -28,15 +79,29 @@ class DataHandler(object):
         if not isinstance(y, Tensor):
             y = torch.tensor([[y]])
         self._validate_data_args(x, y)
-        self.data = TrainingData(X=x, Y=y)
-        
+        # The data itself serves as buffer (without spare capacity) until more is added
+        self._x_buf, self._y_buf = x, y
+        self.data = _lazy_botorch().TrainingData(X=x, Y=y)
+
     def add_xy(self, x: Tensor = None, y: Union[float, Tensor] = None):
         if not isinstance(y, Tensor):
             y = torch.tensor([[y]])
         self._validate_data_args(x, y)
-        x = torch.cat((self.data.X, x)) if self.n_data else x
-        y = torch.cat((self.data.Y, y)) if self.n_data else y
-        self.set_xy(x=x, y=y)
+        if not self.n_data:
+            return self.set_xy(x=x, y=y)
+
+        n, n_new = self.n_data, x.shape[0]
+        if n + n_new > self._x_buf.shape[0]:
+            # Doubling the capacity makes appending amortized O(1) instead of
+            # copying all data on every call
+            capacity = max(2 * self._x_buf.shape[0], n + n_new)
+            self._x_buf = self._grow(self._x_buf[:n], capacity)
+            self._y_buf = self._grow(self._y_buf[:n], capacity)
+        self._x_buf[n : n + n_new] = x
+        self._y_buf[n : n + n_new] = y
+        self.data = _lazy_botorch().TrainingData(
+            X=self._x_buf[: n + n_new], Y=self._y_buf[: n + n_new]
+        )
 
     @property
     def n_data(self):
@@ -50,11 +115,28 @@ class DataHandler(object):
     def y_best(self):
         return torch.max(self.data.Y)
 
+    @property
+    def idx_best_rolling(self):
+        # Same tie rule as `x_best`: the first occurrence of the maximum counts,
+        # i.e., the best index only changes for strictly larger values
+        y = self.data.Y.squeeze(-1)
+        is_new_best = torch.ones_like(y, dtype=torch.bool)
+        is_new_best[1:] = y[1:] > torch.cummax(y, dim=0).values[:-1]
+        idx = torch.arange(y.shape[0], device=y.device)
+        return torch.cummax(idx * is_new_best, dim=0).values
+
     def __len__(self):
         return self.n_data
 
+    @staticmethod
+    def _grow(t: Tensor, capacity: int) -> Tensor:
+        buf = t.new_empty((capacity, t.shape[1]))
+        buf[: t.shape[0]] = t
+        return buf
+
     @staticmethod
     def _validate_data_args(x: Tensor, y: Tensor):
+        BotorchTensorDimensionError = _lazy_botorch().BotorchTensorDimensionError
         if x.dim() != 2:
             message = f"Input dimension is assumed 2-dim. not {x.ndim}-dim."
             raise BotorchTensorDimensionError(message)
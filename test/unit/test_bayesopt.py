@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+import torch
+
+from bayesopt4ros import BayesianOptimization
+
+
+def forrester_function(x):
+    return (6.0 * x - 2.0) ** 2 * torch.sin(12.0 * x - 4.0)
+
+
+@pytest.fixture
+def bo():
+    """Set up a 1-dim. BayesianOptimization instance on the CPU."""
+    return BayesianOptimization(
+        input_dim=1,
+        max_iter=20,
+        bounds=torch.tensor([[0.0], [1.0]]),
+        acq_func="EI",
+        n_init=3,
+        device=torch.device("cpu"),
+        dtype=torch.float64,
+    )
+
+
+def test_reused_model(bo):
+    # Feed data one by one such that the GP is re-used several times
+    x = torch.linspace(0.05, 0.95, 8, dtype=torch.float64).unsqueeze(-1)
+    y = -forrester_function(x)
+    for i in range(x.shape[0]):
+        bo.x_new = x[[i]]
+        bo._update_model(y[i].item())
+    np.testing.assert_equal(bo.n_data, x.shape[0])
+
+    # Fresh model with the same hyperparameters (transforms are learned from data)
+    gp = bo._initialize_model(*bo.data_handler.get_xy())
+    hypers = {k: v for k, v in bo.gp.state_dict().items() if "_transform" not in k}
+    gp.load_state_dict(hypers, strict=False)
+    gp.eval()
+
+    np.testing.assert_allclose(gp.train_targets, bo.gp.train_targets)
+    np.testing.assert_allclose(
+        gp.outcome_transform.means, bo.gp.outcome_transform.means
+    )
+    np.testing.assert_allclose(
+        gp.outcome_transform.stdvs, bo.gp.outcome_transform.stdvs
+    )
+
+    x_test = torch.rand(20, 1, dtype=torch.float64)
+    with torch.no_grad():
+        post_reused, post_fresh = bo.gp.posterior(x_test), gp.posterior(x_test)
+        np.testing.assert_allclose(post_reused.mean, post_fresh.mean, rtol=1e-6)
+        np.testing.assert_allclose(
+            post_reused.variance, post_fresh.variance, rtol=1e-6
+        )
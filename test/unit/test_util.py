@@ -83,6 +83,32 @@ def test_adding_data(test_data):
     np.testing.assert_equal(dh.n_data, 1)
     np.testing.assert_equal(len(dh), 1)
 
+    # Many consecutive single data points (buffers need to grow several times)
+    x_init = test_data.X.clone()
+    dh = DataHandler(x=test_data.X[:1], y=test_data.Y[:1])
+    for i in range(1, test_data.X.shape[0]):
+        dh.add_xy(x=test_data.X[[i]], y=test_data.Y[[i]])
+    x, y = dh.get_xy()
+    np.testing.assert_array_equal(x, test_data.X)
+    np.testing.assert_array_equal(y, test_data.Y)
+    np.testing.assert_array_equal(test_data.X, x_init)  # input was not modified
+    np.testing.assert_equal(dh.n_data, test_data.X.shape[0])
+
+
+def test_best_data():
+    # Tied maxima: the first occurrence is the best one
+    x = torch.arange(6.0).unsqueeze(-1)
+    y = torch.tensor([[1.0], [3.0], [2.0], [3.0], [4.0], [4.0]])
+    dh = DataHandler(x=x, y=y)
+    np.testing.assert_array_equal(dh.x_best, x[4])
+    np.testing.assert_equal(dh.y_best.item(), 4.0)
+
+    idx_best = dh.idx_best_rolling
+    np.testing.assert_array_equal(idx_best, [0, 1, 1, 1, 4, 4])
+    np.testing.assert_array_equal(x[idx_best[-1]], dh.x_best)
+    for i in range(y.shape[0]):
+        np.testing.assert_equal(idx_best[i].item(), torch.argmax(y[: i + 1]).item())
+
 
 def test_wrong_inputs(test_data):
 